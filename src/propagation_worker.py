@@ -0,0 +1,23 @@
+from typing import List, Tuple
+import numpy as np
+from sgp4.api import Satrec, SatrecArray
+
+
+def shard_propagate(tle_lines: List[Tuple[str, str]], jd: np.ndarray, fr: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Worker-process entry point of TLEPropagator.propagate_many_mp: propagate one shard of TLEs.
+    Kept in its own module, importing only numpy and sgp4, so that spawned workers load it cheaply.
+    Args:
+        tle_lines (List[Tuple[str, str]]): (line1, line2) pairs of the shard.
+        jd (np.ndarray): Julian days of the epochs.
+        fr (np.ndarray): Day fractions of the epochs.
+    Returns:
+        tuple: (errors, positions_km, velocities_km_per_s) for the shard.
+    Raises:
+        ValueError: If one of the TLEs cannot be parsed.
+    """
+    try:
+        satrecs = [Satrec.twoline2rv(line1, line2) for line1, line2 in tle_lines]
+    except Exception as e:
+        raise ValueError(f"Failed to parse one or more TLEs: {e}") from e
+    return SatrecArray(satrecs).sgp4(jd, fr)
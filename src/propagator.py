@@ -1,7 +1,111 @@
-from sgp4.api import Satrec, jday
-from datetime import datetime
+from sgp4.api import Satrec, SatrecArray, jday
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+import asyncio
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import functools
+import logging
+import multiprocessing
+import os
+import numpy as np
 import json
 
+from propagation_worker import shard_propagate
+
+logger = logging.getLogger(__name__)
+
+# cysgp4 is optional: when installed, batch requests are propagated with its
+# OpenMP-parallel, GIL-releasing implementation instead of SatrecArray.
+try:
+    from cysgp4 import PyTle, propagate_many as cysgp4_propagate_many, set_num_threads
+    set_num_threads(os.cpu_count() or 1)
+    HAS_CYSGP4 = True
+except ImportError:
+    HAS_CYSGP4 = False
+
+# Reference epoch for Julian date conversion (midnight, 1 January 2000 = JD 2451544.5)
+# and day length in microseconds
+JDAY_REF = datetime(2000, 1, 1)
+JDAY_REF_UTC = JDAY_REF.replace(tzinfo=timezone.utc)
+JDAY_REF_JD = 2451544.5
+MJD_OFFSET = 2400000.5
+US_PER_DAY = 86_400_000_000
+MICROSECOND = timedelta(microseconds=1)
+
+# J2000 epoch (Julian date) and Earth's sidereal rotation constants for GMST (IAU 1982)
+J2000 = 2451545.0
+TAU = 2.0 * np.pi
+SECONDS_PER_DAY = 86400.0
+
+# Minimum number of (satellite, epoch) propagations before propagate_many_mp uses worker processes
+MP_MIN_PROPAGATIONS = 1_000_000
+
+# Maximum number of satellites kept by SatrecCatalog; least recently used ones are evicted beyond it
+CATALOG_MAX_SIZE = 10_000
+
+# Error code reported for epochs that cysgp4 could not propagate (returned as NaN)
+CYSGP4_ERROR = -1
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_tle(line1: str, line2: str) -> Optional[Satrec]:
+    """
+    Parse a single TLE (two lines) into a Satrec object.
+    Results are memoized on the two TLE lines, so an unchanged TLE is only parsed once.
+    Args:
+        line1 (str): First line of the TLE.
+        line2 (str): Second line of the TLE.
+    Returns:
+        Satrec: Parsed satellite record object, or None if parsing fails.
+    """
+    try:
+        sat = Satrec.twoline2rv(line1, line2)
+        return sat
+    except Exception as e:
+        logger.error("Error parsing TLE lines:\n%s\n%s\nError: %s", line1, line2, e)
+        return None
+
+
+if HAS_CYSGP4:
+    @functools.lru_cache(maxsize=4096)
+    def parse_pytle(line1: str, line2: str) -> "PyTle":
+        """
+        Build a cysgp4 PyTle from a single TLE (two lines), memoized on the TLE lines.
+        Args:
+            line1 (str): First line of the TLE.
+            line2 (str): Second line of the TLE.
+        Returns:
+            PyTle: cysgp4 TLE object.
+        """
+        return PyTle("sat", line1, line2)
+
+
+class PropagationResult(NamedTuple):
+    """
+    Output of a batch propagation: error codes of shape (N, M) and contiguous
+    position/velocity arrays of shape (N, M, 3) for N satellites and M epochs.
+    """
+    error: np.ndarray
+    position: np.ndarray
+    velocity: np.ndarray
+
+    @property
+    def x(self) -> np.ndarray:
+        """X component of the positions, as an (N, M) view."""
+        return self.position[..., 0]
+
+    @property
+    def y(self) -> np.ndarray:
+        """Y component of the positions, as an (N, M) view."""
+        return self.position[..., 1]
+
+    @property
+    def z(self) -> np.ndarray:
+        """Z component of the positions, as an (N, M) view."""
+        return self.position[..., 2]
+
+
 class TLEPropagator:
     """
     Provides utilities for parsing TLEs and propagating satellite orbits using SGP4.
@@ -10,7 +114,11 @@ class TLEPropagator:
         """
         Initialize the TLEPropagator.
         """
-        pass
+        # NORAD ID -> (TLE epoch, Satrec) for the most recently seen TLE of each satellite
+        self._satrec_cache: Dict[int, Tuple[str, Satrec]] = {}
+        # Worker pool for propagate_many_mp and its size, created on first use
+        self._executor = None
+        self._executor_workers = 0
 
     def parse_tle(self, line1: str, line2: str):
         """
@@ -21,12 +129,27 @@ class TLEPropagator:
         Returns:
             Satrec: Parsed satellite record object, or None if parsing fails.
         """
-        try:
-            sat = Satrec.twoline2rv(line1, line2)
-            return sat
-        except Exception as e:
-            print(f"Error parsing TLE lines:\n{line1}\n{line2}\nError: {e}")
-            return None
+        return parse_tle(line1, line2)
+
+    def get_satrec(self, norad_cat_id: int, tle_epoch: str, line1: str, line2: str) -> Optional[Satrec]:
+        """
+        Return the Satrec for a satellite, re-parsing the TLE only when its epoch has changed.
+        Args:
+            norad_cat_id (int): NORAD Catalog ID of the satellite.
+            tle_epoch (str): EPOCH of the TLE as reported by Space-Track.
+            line1 (str): First line of the TLE.
+            line2 (str): Second line of the TLE.
+        Returns:
+            Satrec: Parsed satellite record object, or None if parsing fails.
+        """
+        cached = self._satrec_cache.get(norad_cat_id)
+        if cached is not None and cached[0] == tle_epoch:
+            return cached[1]
+
+        satrec = self.parse_tle(line1, line2)
+        if satrec is not None:
+            self._satrec_cache[norad_cat_id] = (tle_epoch, satrec)
+        return satrec
 
     def propagate_satellite(self, satrec, target_epoch: datetime):
         """
@@ -51,18 +174,311 @@ class TLEPropagator:
             error, r, v = satrec.sgp4(jd, fr)
 
             if error:
-                # SGP4_ERRORS is a dictionary in sgp4.api
-                try:
-                    from sgp4.api import SGP4_ERRORS
-                    error_msg = SGP4_ERRORS.get(error, f"Unknown SGP4 error code: {error}")
-                except ImportError:
-                    error_msg = f"SGP4 error code: {error}"
-                print(f"SGP4 propagation error: {error_msg}")
+                logger.error("SGP4 propagation error: %s", sgp4_error_message(error))
                 return None, None
             
             # Convert to lists for JSON serialization
             return list(r), list(v)
 
         except Exception as e:
-            print(f"Error during propagation: {e}")
-            return None, None
\ No newline at end of file
+            logger.error("Error during propagation: %s", e)
+            return None, None
+
+    def propagate_many(self, satrecs: List[Satrec], epochs: List[datetime], dtype=np.float64) -> PropagationResult:
+        """
+        Propagate several satellites to several epochs in a single vectorized SGP4 call.
+        Args:
+            satrecs (List[Satrec]): Satellite record objects from sgp4.
+            epochs (List[datetime]): Target epochs to propagate to.
+            dtype: Floating point type of the returned position and velocity arrays
+                (np.float32 halves the memory of the arrays at the cost of sub-metre precision).
+        Returns:
+            PropagationResult: (errors, positions_km, velocities_km_per_s) in TEME frame, with
+                shapes (N, M), (N, M, 3) and (N, M, 3) for N satellites and M epochs.
+        """
+        jd_arr, fr_arr = jday_vec(epochs)
+
+        # One C-level loop over the whole (satellite, epoch) grid
+        sat_array = SatrecArray(satrecs)
+        e, r, v = sat_array.sgp4(jd_arr, fr_arr)
+        return PropagationResult(e, r.astype(dtype, copy=False), v.astype(dtype, copy=False))
+
+    def propagate_tles(self, tle_lines: List[Tuple[str, str]], epochs: List[datetime], dtype=np.float64,
+                       satrecs: Optional[List[Satrec]] = None) -> PropagationResult:
+        """
+        Propagate several TLEs to several epochs, using cysgp4 when it is installed and the
+        request spans at least two satellites or epochs, and SatrecArray otherwise.
+        Args:
+            tle_lines (List[Tuple[str, str]]): (line1, line2) pairs of the TLEs to propagate.
+            epochs (List[datetime]): Target epochs to propagate to.
+            dtype: Floating point type of the returned position and velocity arrays
+                (np.float32 halves the memory of the arrays at the cost of sub-metre precision).
+            satrecs (Optional[List[Satrec]]): Already parsed Satrec objects of the same TLEs, used
+                by the SatrecArray path instead of parsing tle_lines again.
+        Returns:
+            PropagationResult: (errors, positions_km, velocities_km_per_s) in TEME frame, with
+                shapes (N, M), (N, M, 3) and (N, M, 3) for N satellites and M epochs.
+        Raises:
+            ValueError: If one of the TLEs cannot be parsed.
+        """
+        if HAS_CYSGP4 and (len(tle_lines) >= 2 or len(epochs) >= 2):
+            return self._propagate_tles_cysgp4(tle_lines, epochs, dtype)
+
+        if satrecs is None:
+            satrecs = [parse_tle(line1, line2) for line1, line2 in tle_lines]
+        if any(satrec is None for satrec in satrecs):
+            raise ValueError("Failed to parse one or more TLEs.")
+        return self.propagate_many(satrecs, epochs, dtype)
+
+    async def propagate_many_mp(self, tle_lines: List[Tuple[str, str]], epochs: List[datetime], workers: Optional[int] = None, dtype=np.float64) -> PropagationResult:
+        """
+        Propagate a very large catalog by splitting the satellite axis across worker processes,
+        each propagating its own SatrecArray shard. Small requests are propagated in-process
+        to avoid the process dispatch overhead.
+        Args:
+            tle_lines (List[Tuple[str, str]]): (line1, line2) pairs of the TLEs to propagate.
+            epochs (List[datetime]): Target epochs to propagate to.
+            workers (Optional[int]): Number of worker processes and shards; defaults to the number of CPUs.
+                The pool is kept between calls and recreated when this number changes.
+            dtype: Floating point type of the returned position and velocity arrays.
+        Returns:
+            PropagationResult: (errors, positions_km, velocities_km_per_s) in TEME frame, with
+                shapes (N, M), (N, M, 3) and (N, M, 3) for N satellites and M epochs.
+        Raises:
+            ValueError: If one of the TLEs cannot be parsed.
+        """
+        workers = workers or os.cpu_count() or 1
+        if workers < 2 or len(tle_lines) < 2 * workers or len(tle_lines) * len(epochs) < MP_MIN_PROPAGATIONS:
+            return self.propagate_tles(tle_lines, epochs, dtype)
+
+        if self._executor is None or self._executor_workers != workers:
+            if self._executor is not None:
+                # Let shards already submitted by concurrent calls finish on the old pool
+                self._executor.shutdown(wait=False)
+            # Spawn rather than fork: forking after OpenMP thread pools start can deadlock
+            self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            self._executor_workers = workers
+
+        # Satrec objects cannot be pickled, so each worker parses the TLE lines of its shard
+        jd, fr = jday_vec(epochs)
+        bounds = np.linspace(0, len(tle_lines), workers + 1).astype(int)
+        loop = asyncio.get_running_loop()
+        shards = await asyncio.gather(*[
+            loop.run_in_executor(self._executor, shard_propagate, tle_lines[start:end], jd, fr)
+            for start, end in zip(bounds[:-1], bounds[1:])
+        ])
+
+        e = np.concatenate([shard[0] for shard in shards], axis=0)
+        r = np.concatenate([shard[1] for shard in shards], axis=0)
+        v = np.concatenate([shard[2] for shard in shards], axis=0)
+        return PropagationResult(e, r.astype(dtype, copy=False), v.astype(dtype, copy=False))
+
+    def close(self):
+        """
+        Shut down the worker pool used by propagate_many_mp, if any.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._executor_workers = 0
+
+    def _propagate_tles_cysgp4(self, tle_lines: List[Tuple[str, str]], epochs: List[datetime], dtype=np.float64) -> PropagationResult:
+        """
+        Propagate several TLEs to several epochs with cysgp4, computing ECI state vectors only.
+        Args:
+            tle_lines (List[Tuple[str, str]]): (line1, line2) pairs of the TLEs to propagate.
+            epochs (List[datetime]): Target epochs to propagate to.
+            dtype: Floating point type of the returned position and velocity arrays
+                (np.float32 halves the memory of the arrays at the cost of sub-metre precision).
+        Returns:
+            PropagationResult: (errors, positions_km, velocities_km_per_s) in TEME frame, with
+                shapes (N, M), (N, M, 3) and (N, M, 3) for N satellites and M epochs.
+        """
+        tles = np.array([parse_pytle(line1, line2) for line1, line2 in tle_lines], dtype=object)
+        jd, fr = jday_vec(epochs)
+        mjds = (jd - MJD_OFFSET) + fr
+
+        # Broadcast satellites along axis 0 and epochs along axis 1; skip geodetic/topocentric frames
+        result = cysgp4_propagate_many(
+            mjds[np.newaxis, :],
+            tles[:, np.newaxis],
+            do_eci_pos=True,
+            do_eci_vel=True,
+            do_geo=False,
+            do_topo=False,
+            do_obs_pos=False,
+            do_sat_azel=False,
+            on_error='coerce_to_nan'
+        )
+        r = result['eci_pos']
+        v = result['eci_vel']
+        errors = np.where(np.isnan(r).any(axis=-1), CYSGP4_ERROR, 0)
+        return PropagationResult(errors, r.astype(dtype, copy=False), v.astype(dtype, copy=False))
+
+
+class SatrecCatalog:
+    """
+    Holds the Satrec of many satellites and a SatrecArray over all of them, so that
+    catalog-wide requests are answered by one vectorized propagation plus row indexing.
+    The SatrecArray is rebuilt lazily after the catalog changes. Beyond `max_size`
+    satellites, the least recently propagated ones are evicted.
+    """
+    def __init__(self, max_size: int = CATALOG_MAX_SIZE):
+        """
+        Initialize an empty SatrecCatalog.
+        Args:
+            max_size (int): Maximum number of satellites to keep.
+        """
+        self.max_size = max_size
+        # NORAD ID -> (TLE epoch, Satrec), least recently used first
+        self._entries: "OrderedDict[int, Tuple[str, Satrec]]" = OrderedDict()
+        self._array = None
+        self._index: Dict[int, int] = {}
+
+    def __contains__(self, norad_cat_id: int) -> bool:
+        return norad_cat_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, norad_cat_id: int, tle_epoch: str, satrec: Satrec):
+        """
+        Add or update a satellite and mark it as recently used. The SatrecArray is only
+        invalidated if the TLE changed.
+        Args:
+            norad_cat_id (int): NORAD Catalog ID of the satellite.
+            tle_epoch (str): EPOCH of the TLE as reported by Space-Track.
+            satrec (Satrec): Parsed satellite record object.
+        """
+        cached = self._entries.get(norad_cat_id)
+        if cached is None or cached[0] != tle_epoch:
+            self._entries[norad_cat_id] = (tle_epoch, satrec)
+            self._array = None
+        self._entries.move_to_end(norad_cat_id)
+
+    def evict(self, norad_cat_id: int):
+        """
+        Remove a satellite from the catalog if present.
+        Args:
+            norad_cat_id (int): NORAD Catalog ID of the satellite.
+        """
+        if self._entries.pop(norad_cat_id, None) is not None:
+            self._array = None
+
+    def trim(self):
+        """
+        Evict the least recently used satellites until the catalog fits in max_size.
+        """
+        while len(self._entries) > self.max_size:
+            self.evict(next(iter(self._entries)))
+
+    def as_array(self) -> Tuple[SatrecArray, Dict[int, int]]:
+        """
+        Return the SatrecArray over the whole catalog and the NORAD ID -> row index map.
+        """
+        if self._array is None:
+            self._index = {norad_cat_id: row for row, norad_cat_id in enumerate(self._entries)}
+            self._array = SatrecArray([satrec for _, satrec in self._entries.values()])
+        return self._array, self._index
+
+    def propagate(self, norad_cat_ids: List[int], epochs: List[datetime], dtype=np.float64) -> PropagationResult:
+        """
+        Propagate catalog satellites to several epochs, then evict the least recently used
+        satellites beyond max_size.
+        The whole-catalog SatrecArray is used when it is already built and the request covers
+        at least half of the catalog, or when the request covers all of it; otherwise a
+        SatrecArray of just the requested rows is built.
+        Args:
+            norad_cat_ids (List[int]): NORAD Catalog IDs to propagate; all must be in the catalog.
+            epochs (List[datetime]): Target epochs to propagate to.
+            dtype: Floating point type of the returned position and velocity arrays.
+        Returns:
+            PropagationResult: Results with row i corresponding to norad_cat_ids[i].
+        Raises:
+            KeyError: If a NORAD ID is not in the catalog.
+        """
+        jd, fr = jday_vec(epochs)
+        for norad_cat_id in norad_cat_ids:
+            self._entries.move_to_end(norad_cat_id)
+
+        n_requested = len(set(norad_cat_ids))
+        if n_requested == len(self._entries) or (self._array is not None and 2 * n_requested >= len(self._entries)):
+            sat_array, index = self.as_array()
+            rows = np.fromiter((index[norad_cat_id] for norad_cat_id in norad_cat_ids), dtype=np.intp, count=len(norad_cat_ids))
+            e, r, v = sat_array.sgp4(jd, fr)
+            e, r, v = np.take(e, rows, axis=0), np.take(r, rows, axis=0), np.take(v, rows, axis=0)
+        else:
+            sat_array = SatrecArray([self._entries[norad_cat_id][1] for norad_cat_id in norad_cat_ids])
+            e, r, v = sat_array.sgp4(jd, fr)
+
+        self.trim()
+        return PropagationResult(e, r.astype(dtype, copy=False), v.astype(dtype, copy=False))
+
+
+def jday_vec(epochs: List[datetime]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized equivalent of sgp4.api.jday for a sequence of datetimes.
+    Datetimes are reduced to integer microseconds since a midnight reference epoch and split
+    into whole days and a day fraction, which matches jday without per-field arithmetic.
+    Args:
+        epochs (List[datetime]): Epochs to convert (naive datetimes are assumed to be UTC).
+    Returns:
+        tuple: (jd, fr) float64 arrays holding the whole Julian day and the day fraction.
+    """
+    total_us = np.fromiter(
+        ((t - (JDAY_REF if t.tzinfo is None else JDAY_REF_UTC)) // MICROSECOND for t in epochs),
+        dtype=np.int64,
+        count=len(epochs)
+    )
+    days, rem = np.divmod(total_us, US_PER_DAY)
+    return days + JDAY_REF_JD, rem / US_PER_DAY
+
+
+def teme_to_itrf(jd: np.ndarray, fr: np.ndarray, r: np.ndarray, v: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Rotate TEME state vectors into ITRF using only the Earth's sidereal rotation (GMST 1982),
+    which avoids the nutation/precession series of a full GCRS round trip. UT1 is approximated
+    by UTC and polar motion is neglected.
+    Args:
+        jd (np.ndarray): Julian days of the epochs, shape (M,).
+        fr (np.ndarray): Day fractions of the epochs, shape (M,).
+        r (np.ndarray): TEME positions in km, shape (..., M, 3).
+        v (np.ndarray): TEME velocities in km/s, shape (..., M, 3).
+    Returns:
+        tuple: (positions_km, velocities_km_per_s) in ITRF, with the same shapes as r and v.
+    """
+    t = (jd - J2000 + fr) / 36525.0
+    g = 67310.54841 + (8640184.812866 + (0.093104 + (-6.2e-6) * t) * t) * t
+    dg = 8640184.812866 + (0.093104 * 2.0 + (-6.2e-6 * 3.0) * t) * t
+    theta = (jd % 1.0 + fr + g / SECONDS_PER_DAY) % 1.0 * TAU
+    # Earth rotation rate in rad/s
+    theta_dot = (1.0 + dg / SECONDS_PER_DAY / 36525.0) * TAU / SECONDS_PER_DAY
+
+    cos_t, sin_t = np.cos(theta), np.sin(theta)
+    x = cos_t * r[..., 0] + sin_t * r[..., 1]
+    y = -sin_t * r[..., 0] + cos_t * r[..., 1]
+    r_itrf = np.stack([x, y, r[..., 2]], axis=-1)
+
+    # Rotated velocity minus the velocity of the rotating frame (omega x r)
+    vx = cos_t * v[..., 0] + sin_t * v[..., 1] + theta_dot * y
+    vy = -sin_t * v[..., 0] + cos_t * v[..., 1] - theta_dot * x
+    v_itrf = np.stack([vx, vy, v[..., 2]], axis=-1)
+    return r_itrf.astype(r.dtype, copy=False), v_itrf.astype(v.dtype, copy=False)
+
+
+def sgp4_error_message(error: int) -> str:
+    """
+    Translate an SGP4 error code into a human-readable message.
+    Args:
+        error (int): Non-zero error code returned by sgp4 or cysgp4.
+    Returns:
+        str: Description of the error.
+    """
+    if error == CYSGP4_ERROR:
+        return "cysgp4 propagation failed"
+    # SGP4_ERRORS is a dictionary in sgp4.api
+    try:
+        from sgp4.api import SGP4_ERRORS
+        return SGP4_ERRORS.get(error, f"Unknown SGP4 error code: {error}")
+    except ImportError:
+        return f"SGP4 error code: {error}"
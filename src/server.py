@@ -1,31 +1,116 @@
 # src/server.py (Using decorator syntax)
 import os
 import asyncio
-import atexit
+import functools
+from contextlib import asynccontextmanager
+import logging
+import sys
 from datetime import datetime, timezone
-from typing import List, Optional, Dict, Union
+from typing import AsyncIterator, List, Optional, Dict, Tuple, Union
+import numpy as np
 from dotenv import load_dotenv
 
+# ciso8601 is optional: a C ISO 8601 parser that is much faster than datetime.fromisoformat
+try:
+    from ciso8601 import parse_datetime as _parse_iso8601
+except ImportError:
+    def _parse_iso8601(value: str) -> datetime:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
 from mcp.server import Server, FastMCP
 from mcp.types import Tool, TextContent, CallToolResult, Resource
 from spacetrack_client import SpaceTrackClient
-from propagator import TLEPropagator
+from tle_cache import TLECache, default_cache_path
+from propagator import TLEPropagator, SatrecCatalog, MP_MIN_PROPAGATIONS, jday_vec, sgp4_error_message, teme_to_itrf
+
+logger = logging.getLogger(__name__)
+
+# Worker processes spawned by propagate_many_mp re-import this script under the name __mp_main__.
+# They only run propagation_worker.shard_propagate, so they skip loading and checking credentials;
+# the rest of the module-level setup only builds idle objects and opens nothing.
+IS_PROPAGATION_WORKER = __name__ == "__mp_main__"
 
 # Load environment variables
-load_dotenv()
+if not IS_PROPAGATION_WORKER:
+    load_dotenv()
 
 # Initialize Space-Track client
 ST_USERNAME = os.getenv("SPACE_TRACK_USERNAME")
 ST_PASSWORD = os.getenv("SPACE_TRACK_PASSWORD")
 
-if not ST_USERNAME or not ST_PASSWORD:
+if not IS_PROPAGATION_WORKER and (not ST_USERNAME or not ST_PASSWORD):
     raise ValueError("SPACE_TRACK_USERNAME and SPACE_TRACK_PASSWORD must be set in the .env file.")
 
-space_track_client = SpaceTrackClient(ST_USERNAME, ST_PASSWORD)
+# Local pull-through cache for Space-Track responses (set SPACE_TRACK_CACHE_TTL=0 to disable)
+CACHE_PATH = os.getenv("SPACE_TRACK_CACHE_PATH") or default_cache_path()
+CACHE_TTL = float(os.getenv("SPACE_TRACK_CACHE_TTL", "300"))
+tle_cache = TLECache(CACHE_PATH, ttl=CACHE_TTL) if CACHE_TTL > 0 else None
+
+space_track_client = SpaceTrackClient(ST_USERNAME, ST_PASSWORD, cache=tle_cache)
 tle_propagator = TLEPropagator()
 
+# The only TLE fields the propagation tools read; Space-Track ships just these
+PROPAGATION_FIELDS = ('TLE_LINE1', 'TLE_LINE2', 'EPOCH')
+
+# Decimal places kept in single_precision output: metres for positions (km), mm/s for velocities (km/s)
+SINGLE_PRECISION_POSITION_DECIMALS = 3
+SINGLE_PRECISION_VELOCITY_DECIMALS = 6
+
+# Satellites recently seen by propagate_many_ids, kept as one reusable SatrecArray (LRU-bounded)
+satrec_catalog = SatrecCatalog()
+
+
+def state_to_lists(positions: np.ndarray, velocities: np.ndarray, single_precision: bool) -> Tuple[list, list]:
+    """
+    Convert position and velocity arrays to nested lists for the JSON response.
+    With single_precision, values are rounded to metres and mm/s (about the resolution of
+    float32) so that they serialize to roughly half as many characters.
+    """
+    if single_precision:
+        positions = np.round(positions.astype(np.float64), SINGLE_PRECISION_POSITION_DECIMALS)
+        velocities = np.round(velocities.astype(np.float64), SINGLE_PRECISION_VELOCITY_DECIMALS)
+    return positions.tolist(), velocities.tolist()
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_epoch(epoch: str) -> datetime:
+    """
+    Parse an ISO 8601 epoch into a timezone-aware UTC datetime (naive input is assumed to be UTC).
+    Results are cached, since polling clients often repeat the same timestamps.
+    Raises:
+        ValueError: If the epoch is not valid ISO 8601.
+    """
+    dt = _parse_iso8601(epoch)
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+# Number of MCP sessions currently inside the lifespan
+_active_sessions = 0
+
+
+@asynccontextmanager
+async def lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """
+    Server lifespan, entered once per MCP session (once for stdio, once per connection for SSE).
+    The Space-Track client (HTTP session and cache) and the propagation worker pool are shared
+    by the whole process, so they are only closed, inside the server's own event loop, when the
+    last active session ends. They reopen lazily if a new session starts afterwards.
+    """
+    global _active_sessions
+    _active_sessions += 1
+    try:
+        yield
+    finally:
+        _active_sessions -= 1
+        if _active_sessions == 0:
+            await space_track_client.close()
+            tle_propagator.close()
+
+
 # Initialize FastMCP server
-mcp = FastMCP("Space-Track MCP Server")
+mcp = FastMCP("Space-Track MCP Server", lifespan=lifespan)
 
 # Tool 1: Get TLE data (using decorator)
 @mcp.tool()
@@ -81,19 +166,29 @@ async def get_tles(
 @mcp.tool()
 async def propagate_satellite_position(
     norad_cat_id: int,
-    epoch: str
+    epoch: Union[str, List[str]],
+    single_precision: bool = False,
+    frame: str = 'teme'
 ) -> Dict:
     """
-    Propagates a satellite's position to a future epoch given its NORAD Catalog ID (in the TEME frame).
+    Propagates a satellite's position to a future epoch given its NORAD Catalog ID (in the TEME frame by default).
     Args:
         norad_cat_id: The NORAD Catalog ID of the satellite.
-        epoch: The target epoch for propagation in ISO 8601 format (e.g., '2025-12-31T12:00:00Z').
+        epoch: The target epoch for propagation in ISO 8601 format (e.g., '2025-12-31T12:00:00Z'),
+            or a list of such epochs to propagate a trajectory in a single batch.
+        single_precision: Compute in 32-bit floats and round the output to metres and mm/s, which roughly halves the response size.
+        frame: Output reference frame, 'teme' (SGP4 native) or 'itrf' (Earth-fixed, sidereal rotation only).
     Returns:
-        A dictionary containing the NORAD ID, target epoch, and propagated position/velocity.
+        A dictionary containing the NORAD ID, target epoch(s), frame, and propagated position/velocity.
+        For a list of epochs, position and velocity are lists with one vector per epoch.
     """
     try:
+        frame = frame.lower()
+        if frame not in ('teme', 'itrf'):
+            return {"error": "Invalid frame. Use 'teme' or 'itrf'."}
+
         # 1. Get the latest TLE for the given NORAD ID
-        tle = await space_track_client.get_tles(norad_cat_id=norad_cat_id, format_type='json', limit=1)
+        tle = await space_track_client.get_tles(norad_cat_id=norad_cat_id, format_type='json', limit=1, fields=PROPAGATION_FIELDS)
         
         if not tle:
             return {"error": f"No TLEs found for NORAD ID: {norad_cat_id}"}
@@ -102,24 +197,51 @@ async def propagate_satellite_position(
         tle_line1 = tle[0]['TLE_LINE1']
         tle_line2 = tle[0]['TLE_LINE2']
 
-        satrec = tle_propagator.parse_tle(tle_line1, tle_line2)
+        # Reuse the previously parsed Satrec unless Space-Track returned a newer TLE
+        satrec = tle_propagator.get_satrec(norad_cat_id, tle[0]['EPOCH'], tle_line1, tle_line2)
         if not satrec:
             return {"error": f"Failed to parse TLE for NORAD ID {norad_cat_id}."}
 
-        # 3. Propagate to the target epoch
+        # 3. Propagate to the target epoch(s)
+        epochs = [epoch] if isinstance(epoch, str) else list(epoch)
+        if not epochs:
+            return {"error": "At least one epoch must be provided."}
         try:
-            target_datetime = datetime.fromisoformat(epoch)
+            target_datetimes = [parse_epoch(e) for e in epochs]
         except ValueError:
             return {"error": "Invalid epoch format. Please use ISO 8601 (e.g., '2025-12-31T12:00:00Z')."}
 
-        position, velocity = tle_propagator.propagate_satellite(satrec, target_datetime)
+        if len(target_datetimes) == 1:
+            position, velocity = tle_propagator.propagate_satellite(satrec, target_datetimes[0])
+
+            if position is None:
+                return {"error": f"Failed to propagate satellite {norad_cat_id} to {epochs[0]}."}
+
+            positions, velocities = np.array([position]), np.array([velocity])
+            if frame == 'itrf':
+                jd, fr = jday_vec(target_datetimes)
+                positions, velocities = teme_to_itrf(jd, fr, positions, velocities)
+            position, velocity = state_to_lists(positions[0], velocities[0], single_precision)
+        else:
+            # Batch path: all epochs in one vectorized SGP4 call
+            errors, positions, velocities = tle_propagator.propagate_tles(
+                [(tle_line1, tle_line2)], target_datetimes,
+                dtype=np.float32 if single_precision else np.float64, satrecs=[satrec]
+            )
+            failed = errors[0].nonzero()[0]
+            if failed.size:
+                first = failed[0]
+                return {"error": f"Failed to propagate satellite {norad_cat_id} to {epochs[first]}: {sgp4_error_message(int(errors[0][first]))}"}
 
-        if position is None:
-            return {"error": f"Failed to propagate satellite {norad_cat_id} to {epoch}."}
+            if frame == 'itrf':
+                jd, fr = jday_vec(target_datetimes)
+                positions, velocities = teme_to_itrf(jd, fr, positions, velocities)
+            position, velocity = state_to_lists(positions[0], velocities[0], single_precision)
 
         return {
             "norad_cat_id": norad_cat_id,
             "target_epoch": epoch,
+            "frame": frame,
             "position_km": position,
             "velocity_km_per_s": velocity,
             "tle_epoch": tle[0]['EPOCH']
@@ -129,30 +251,176 @@ async def propagate_satellite_position(
         return {"error": str(e)}
     
     
+# Tool 3: Propagate a constellation of satellites (using decorator)
+@mcp.tool()
+async def propagate_constellation(
+    norad_cat_ids: List[int],
+    epoch: str,
+    single_precision: bool = False
+) -> Dict:
+    """
+    Propagates several satellites to a common epoch given their NORAD Catalog IDs (in the TEME frame).
+    TLEs are fetched concurrently and all satellites are propagated in a single batch.
+    Args:
+        norad_cat_ids: The NORAD Catalog IDs of the satellites.
+        epoch: The target epoch for propagation in ISO 8601 format (e.g., '2025-12-31T12:00:00Z').
+        single_precision: Compute in 32-bit floats and round the output to metres and mm/s, which roughly halves the response size.
+    Returns:
+        A dictionary containing the target epoch and, for each satellite, its propagated
+        position/velocity or an error message.
+    """
+    try:
+        try:
+            target_datetime = parse_epoch(epoch)
+        except ValueError:
+            return {"error": "Invalid epoch format. Please use ISO 8601 (e.g., '2025-12-31T12:00:00Z')."}
+
+        # 1. Get the latest TLE of every satellite concurrently
+        tles = await space_track_client.get_tles_bulk(norad_cat_ids, format_type='json', limit=1, fields=PROPAGATION_FIELDS)
+
+        satellites = {}
+        found = []
+        for norad_cat_id, tle in zip(norad_cat_ids, tles):
+            if not tle:
+                satellites[norad_cat_id] = {"norad_cat_id": norad_cat_id, "error": f"No TLEs found for NORAD ID: {norad_cat_id}"}
+                continue
+            satrec = tle_propagator.get_satrec(norad_cat_id, tle[0]['EPOCH'], tle[0]['TLE_LINE1'], tle[0]['TLE_LINE2'])
+            if satrec is None:
+                satellites[norad_cat_id] = {"norad_cat_id": norad_cat_id, "error": f"Failed to parse TLE for NORAD ID {norad_cat_id}."}
+                continue
+            found.append((norad_cat_id, tle[0], satrec))
+
+        # 2. Propagate every satellite with a valid TLE in one batch
+        if found:
+            tle_lines = [(tle['TLE_LINE1'], tle['TLE_LINE2']) for _, tle, _ in found]
+            errors, positions, velocities = tle_propagator.propagate_tles(
+                tle_lines, [target_datetime], dtype=np.float32 if single_precision else np.float64,
+                satrecs=[satrec for _, _, satrec in found]
+            )
+            for row, (norad_cat_id, tle, _) in enumerate(found):
+                if errors[row][0]:
+                    satellites[norad_cat_id] = {
+                        "norad_cat_id": norad_cat_id,
+                        "error": f"Failed to propagate satellite {norad_cat_id} to {epoch}: {sgp4_error_message(int(errors[row][0]))}"
+                    }
+                else:
+                    position, velocity = state_to_lists(positions[row][0], velocities[row][0], single_precision)
+                    satellites[norad_cat_id] = {
+                        "norad_cat_id": norad_cat_id,
+                        "position_km": position,
+                        "velocity_km_per_s": velocity,
+                        "tle_epoch": tle['EPOCH']
+                    }
+
+        return {
+            "target_epoch": epoch,
+            "satellites": [satellites[norad_cat_id] for norad_cat_id in norad_cat_ids]
+        }
+
+    except Exception as e:
+        return {"error": str(e)}
+
+
+# Tool 4: Propagate many satellites to many epochs (using decorator)
+@mcp.tool()
+async def propagate_many_ids(
+    norad_cat_ids: List[int],
+    epochs: List[str],
+    single_precision: bool = False
+) -> Dict:
+    """
+    Propagates several satellites to several epochs given their NORAD Catalog IDs (in the TEME frame).
+    Satellites are kept in a server-side catalog so repeated requests reuse the same vectorized propagator.
+    Args:
+        norad_cat_ids: The NORAD Catalog IDs of the satellites.
+        epochs: The target epochs for propagation in ISO 8601 format (e.g., ['2025-12-31T12:00:00Z']).
+        single_precision: Compute in 32-bit floats and round the output to metres and mm/s, which roughly halves the response size.
+    Returns:
+        A dictionary containing the target epochs and, for each satellite, one position/velocity
+        per epoch (null where propagation failed) or an error message.
+    """
+    try:
+        try:
+            target_datetimes = [parse_epoch(e) for e in epochs]
+        except ValueError:
+            return {"error": "Invalid epoch format. Please use ISO 8601 (e.g., '2025-12-31T12:00:00Z')."}
+        if not target_datetimes:
+            return {"error": "At least one epoch must be provided."}
+
+        # 1. Get the latest TLE of every satellite
+        tles = await space_track_client.get_tles_bulk(norad_cat_ids, format_type='json', limit=1, fields=PROPAGATION_FIELDS)
+
+        satellites = {}
+        found = []
+        for norad_cat_id, tle in zip(norad_cat_ids, tles):
+            if not tle:
+                satellites[norad_cat_id] = {"norad_cat_id": norad_cat_id, "error": f"No TLEs found for NORAD ID: {norad_cat_id}"}
+                continue
+            satrec = tle_propagator.get_satrec(norad_cat_id, tle[0]['EPOCH'], tle[0]['TLE_LINE1'], tle[0]['TLE_LINE2'])
+            if satrec is None:
+                satellites[norad_cat_id] = {"norad_cat_id": norad_cat_id, "error": f"Failed to parse TLE for NORAD ID {norad_cat_id}."}
+                continue
+            found.append((norad_cat_id, tle[0], satrec))
+
+        # 2. Propagate the requested rows of the catalog in one batch
+        if found:
+            dtype = np.float32 if single_precision else np.float64
+            if len(found) * len(target_datetimes) >= MP_MIN_PROPAGATIONS:
+                # Very large requests are sharded across worker processes and bypass the catalog
+                tle_lines = [(tle['TLE_LINE1'], tle['TLE_LINE2']) for _, tle, _ in found]
+                errors, positions, velocities = await tle_propagator.propagate_many_mp(tle_lines, target_datetimes, dtype=dtype)
+            else:
+                for norad_cat_id, tle, satrec in found:
+                    satrec_catalog.add(norad_cat_id, tle['EPOCH'], satrec)
+                errors, positions, velocities = satrec_catalog.propagate(
+                    [norad_cat_id for norad_cat_id, _, _ in found], target_datetimes, dtype=dtype
+                )
+            for row, (norad_cat_id, tle, _) in enumerate(found):
+                failed = errors[row] != 0
+                position, velocity = state_to_lists(positions[row], velocities[row], single_precision)
+                satellites[norad_cat_id] = {
+                    "norad_cat_id": norad_cat_id,
+                    "position_km": [None if bad else r for bad, r in zip(failed, position)],
+                    "velocity_km_per_s": [None if bad else v for bad, v in zip(failed, velocity)],
+                    "tle_epoch": tle['EPOCH']
+                }
+
+        return {
+            "target_epochs": epochs,
+            "satellites": [satellites[norad_cat_id] for norad_cat_id in norad_cat_ids]
+        }
+
+    except Exception as e:
+        return {"error": str(e)}
+
+
 # Cleanup function
 def cleanup_session():
-    """Cleanup function to close the Space-Track client session."""
+    """
+    Cleanup function to close the Space-Track client session and the propagation worker pool
+    after the server has stopped without leaving its lifespan.
+    """
     try:
-        print("Closing Space-Track client session...")
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(space_track_client.close())
-        loop.close()
-        print("Session closed successfully.")
+        logger.info("Closing Space-Track client session...")
+        asyncio.run(space_track_client.close())
+        tle_propagator.close()
+        logger.info("Session closed successfully.")
     except Exception as e:
-        print(f"Error during session cleanup: {e}")
-
-# Register cleanup function
-atexit.register(cleanup_session)
+        logger.error("Error during session cleanup: %s", e)
 
 # Main execution
 if __name__ == "__main__":
+    # Log to stderr: stdout carries the MCP stdio protocol
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), handlers=[handler])
+
     try:        
         mcp.run()
         
     except KeyboardInterrupt:
-        print("\nShutting down server...")
+        logger.info("Shutting down server...")
         cleanup_session()
     except Exception as e:
-        print(f"Error running server: {e}")
+        logger.error("Error running server: %s", e)
         cleanup_session()
\ No newline at end of file
@@ -1,62 +1,197 @@
 import asyncio
 import aiohttp
-import json
-import os
-from urllib.parse import urlencode
-from typing import List, Dict, Optional, Union
+import orjson
+import logging
+from urllib.parse import urlencode, quote
+from typing import List, Dict, Optional, Tuple, Union
 import datetime
+import time
+from email.utils import parsedate_to_datetime
+
+from tle_cache import TLECache
+
+logger = logging.getLogger(__name__)
+
+# Process-wide HTTP session shared by every client, so pooled TCP/TLS connections,
+# DNS lookups and the auth cookie are reused across MCP tool calls.
+_shared_session: Optional[aiohttp.ClientSession] = None
+_session_lock = asyncio.Lock()
+
+
+async def get_shared_session() -> aiohttp.ClientSession:
+    """
+    Return the shared aiohttp session, creating it on first use.
+    The lock ensures concurrent tool calls do not spawn duplicate sessions.
+    Returns:
+        aiohttp.ClientSession: The shared session.
+    """
+    global _shared_session
+    async with _session_lock:
+        if _shared_session is None or _shared_session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=20,
+                limit_per_host=10,
+                ttl_dns_cache=300,
+                keepalive_timeout=75,
+                enable_cleanup_closed=True
+            )
+            # aiohttp advertises every encoding it can decode (gzip and deflate, plus br/zstd
+            # when their optional packages are installed) and decompresses responses itself
+            _shared_session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=30, connect=5),
+                cookie_jar=aiohttp.CookieJar(unsafe=False)
+            )
+        return _shared_session
+
+
+async def close_shared_session():
+    """
+    Close the shared aiohttp session if it exists.
+    """
+    global _shared_session
+    async with _session_lock:
+        if _shared_session is not None:
+            await _shared_session.close()
+            _shared_session = None
+
+
+# Space-Track auth cookies and their lifetime; the session is renewed shortly before expiry
+AUTH_COOKIE_NAMES = ("chocolatechip", "spacetrack_csrf_cookie")
+AUTH_LIFETIME = 2 * 3600
+AUTH_REFRESH_MARGIN = 60
+
+# Maximum number of Space-Track requests in flight at once
+MAX_CONCURRENT_REQUESTS = 8
+
+# Space-Track query operator for each (has_min, has_max) combination of a range filter
+RANGE_OPS = {(True, True): '--', (True, False): '>', (False, True): '<'}
+
+
+# Filter applied when a range field with a default is left unbounded
+RANGE_DEFAULTS = {"EPOCH": ">now-1"}
+
+
+def _range_seg(name: str, lo, hi, has_default: bool = False) -> Optional[str]:
+    """
+    Build the query path segment for a range filter on a Space-Track field.
+    Args:
+        name (str): Space-Track field name (e.g. 'EPOCH').
+        lo: Lower bound, or None.
+        hi: Upper bound, or None.
+        has_default (bool): Use the field's entry in RANGE_DEFAULTS when neither bound is given.
+    Returns:
+        Optional[str]: The '<name>/<quoted value>' segment, or None if no filter applies.
+    """
+    op = RANGE_OPS.get((bool(lo), bool(hi)))
+    if op == '--':
+        value = f"{lo}--{hi}"
+    elif op == '>':
+        value = f">{lo}"
+    elif op == '<':
+        value = f"<{hi}"
+    elif has_default:
+        value = RANGE_DEFAULTS[name]
+    else:
+        return None
+    return f"{name}/{quote(value, safe='')}"
+
 
 class SpaceTrackClient:
-    def __init__(self, username: str, password: str):
+    def __init__(self, username: str, password: str, cache: Optional[TLECache] = None):
         """
         Initialize the SpaceTrackClient with user credentials.
         Args:
             username (str): Space-Track.org username.
             password (str): Space-Track.org password.
+            cache (Optional[TLECache]): Local cache for query responses, or None to always query Space-Track.
         """
         self.username = username
         self.password = password
         self.base_url = "https://www.space-track.org"
         self.session = None 
         self._authenticated = False
+        self._auth_expires = 0.0  # time.monotonic() deadline of the auth cookie
+        self._auth_lock = asyncio.Lock()
+        self.cache = cache
+        self._sem = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
 
     async def _ensure_session(self):
         """
         Ensure an active aiohttp session exists for making requests.
         """
-        if self.session is None:
-            self.session = aiohttp.ClientSession()
+        if self.session is None or self.session.closed:
+            self.session = await get_shared_session()
+
+    def _auth_valid(self) -> bool:
+        """
+        Whether the session is open and its authentication cookie is still valid (with a safety margin).
+        """
+        return (
+            self._authenticated
+            and self.session is not None and not self.session.closed
+            and time.monotonic() < self._auth_expires - AUTH_REFRESH_MARGIN
+        )
+
+    def _auth_cookie_lifetime(self) -> float:
+        """
+        Seconds until the Space-Track auth cookies expire, read from the session cookie jar.
+        Returns:
+            float: Remaining lifetime, capped at (and defaulting to) AUTH_LIFETIME.
+        """
+        lifetime = AUTH_LIFETIME
+        now = datetime.datetime.now(datetime.timezone.utc)
+        for cookie in self.session.cookie_jar:
+            if cookie.key not in AUTH_COOKIE_NAMES:
+                continue
+            try:
+                if cookie['max-age']:
+                    lifetime = min(lifetime, float(cookie['max-age']))
+                elif cookie['expires']:
+                    expires = parsedate_to_datetime(cookie['expires'])
+                    lifetime = min(lifetime, (expires - now).total_seconds())
+            except (TypeError, ValueError):
+                continue
+        return lifetime
 
     async def login(self):
         """
         Authenticate with Space-Track.org using provided credentials.
-        Ensures a session is established and sets authentication state.
+        Ensures a session is established and sets authentication state, including
+        when the auth cookie expires so the next login happens just before it does.
         Raises:
             Exception: If authentication fails or connection issues occur.
         """
-        if self._authenticated:
+        if self._auth_valid():
             return
 
-        await self._ensure_session()  # Make sure session exists
+        # Only one task logs in; the others wait and reuse its cookie
+        async with self._auth_lock:
+            if self._auth_valid():
+                return
 
-        login_url = f"{self.base_url}/ajaxauth/login"
-        payload = {"identity": self.username, "password": self.password}
-        try:
-            async with self.session.post(login_url, data=payload) as response:
-                response.raise_for_status()
-                response_text = await response.text()
-                # Space-Track doesn't always return "Login Successful" - check for redirect or cookies
-                if response.status == 200:
-                    self._authenticated = True
-                    print("Successfully authenticated with Space-Track.")
-                else:
-                    raise Exception("Space-Track authentication failed. Check credentials.")
-        except aiohttp.ClientError as e:
-            raise Exception(f"Failed to connect to Space-Track for authentication: {e}")
+            await self._ensure_session()  # Make sure session exists
+
+            login_url = f"{self.base_url}/ajaxauth/login"
+            payload = {"identity": self.username, "password": self.password}
+            try:
+                async with self.session.post(login_url, data=payload) as response:
+                    response.raise_for_status()
+                    response_text = await response.text()
+                    # Space-Track doesn't always return "Login Successful" - check for redirect or cookies
+                    if response.status == 200:
+                        self._authenticated = True
+                        self._auth_expires = time.monotonic() + self._auth_cookie_lifetime()
+                        logger.info("Successfully authenticated with Space-Track.")
+                    else:
+                        raise Exception("Space-Track authentication failed. Check credentials.")
+            except aiohttp.ClientError as e:
+                raise Exception(f"Failed to connect to Space-Track for authentication: {e}")
 
     async def make_request(self, endpoint: str) -> Union[List[Dict], str]:
         """
         Make a request to the Space-Track API for a given endpoint.
+        Responses are served from the local cache when a fresh entry exists.
         Args:
             endpoint (str): The API endpoint to query (relative to /basicspacedata/query/).
         Returns:
@@ -64,30 +199,44 @@ class SpaceTrackClient:
         Raises:
             Exception: If the request fails or response cannot be decoded.
         """
-        await self.login()  # This will ensure session exists
+        url = f'{self.base_url}/basicspacedata/query/{endpoint}'
+        if self.cache is not None:
+            cached = await self.cache.get(url)
+            if cached is not None:
+                return cached
+
+        # Bound concurrent requests to respect Space-Track's rate limits
+        async with self._sem:
+            # Cheap expiry check; only log in (and ensure the session) when the cookie is about to lapse
+            if not self._auth_valid():
+                await self.login()
         
-        try:
-            url = f'{self.base_url}/basicspacedata/query/{endpoint}'
-            print(f"Making request to: {url}", file=os.sys.stderr)  # Debug logging
+            try:
+                logger.debug("Making request to: %s", url)
             
-            async with self.session.get(url) as response:
-                response.raise_for_status()  # Raises an exception for 4xx/5xx responses
+                async with self.session.get(url) as response:
+                    response.raise_for_status()  # Raises an exception for 4xx/5xx responses
                 
-                # Check content type to determine how to parse
-                content_type = response.headers.get('content-type', '').lower()
+                    # Check content type to determine how to parse
+                    content_type = response.headers.get('content-type', '').lower()
+                    logger.debug("Response Content-Encoding: %s", response.headers.get('Content-Encoding', 'identity'))
                 
-                if 'application/json' in content_type:
-                    return await response.json()
-                else:
-                    # For TLE format, XML, CSV, etc.
-                    return await response.text()
+                    if 'application/json' in content_type:
+                        data = orjson.loads(await response.read())
+                    else:
+                        # For TLE format, XML, CSV, etc.
+                        data = await response.text()
                     
-        except aiohttp.ClientError as e:
-            error_text = await response.text() if 'response' in locals() else "No response body"
-            raise Exception(f"Request failed with status {response.status}: {error_text}. Error: {e}")
-        except json.JSONDecodeError:
-            error_text = await response.text() if 'response' in locals() else "No response body"
-            raise Exception(f"Failed to decode JSON from Space-Track response: {error_text}")
+            except aiohttp.ClientError as e:
+                error_text = await response.text() if 'response' in locals() else "No response body"
+                raise Exception(f"Request failed with status {response.status}: {error_text}. Error: {e}")
+            except orjson.JSONDecodeError:
+                error_text = await response.text() if 'response' in locals() else "No response body"
+                raise Exception(f"Failed to decode JSON from Space-Track response: {error_text}")
+
+        if self.cache is not None:
+            await self.cache.put(url, data)
+        return data
 
     async def get_tles(
         self,
@@ -99,7 +248,8 @@ class SpaceTrackClient:
         eccentricity_min: Optional[float] = None,  # Example: 0.0
         eccentricity_max: Optional[float] = None,  # Example: 0.1
         format_type: Optional[str] = None,  # 'json', 'tle', 'xml', 'csv'
-        limit: int = 10 
+        limit: int = 10,
+        fields: Tuple[str, ...] = ()
     ) -> Union[List[Dict], str]:
         """
         Fetch TLEs from Space-Track based on various criteria.
@@ -113,42 +263,31 @@ class SpaceTrackClient:
             eccentricity_max (Optional[float]): Maximum eccentricity.
             format_type (Optional[str]): Output format ('json', 'tle', 'xml', 'csv').
             limit (int): Maximum number of results to return.
+            fields (Tuple[str, ...]): Fields to return (e.g. ('TLE_LINE1', 'TLE_LINE2', 'EPOCH')); all fields if empty.
         Returns:
             Union[List[Dict], str]: List of TLE dictionaries or raw string, depending on format_type.
         """
-        print(f" DEBUG: Entering get_tles. Received params: norad_cat_id={norad_cat_id}, start_date={start_date}, end_date={end_date}, mean_min={mean_motion_min}, mean_max={mean_motion_max}, ecc_min={eccentricity_min}, ecc_max={eccentricity_max}, format={format_type}", file=os.sys.stderr)
+        logger.debug(
+            "Entering get_tles. Received params: norad_cat_id=%s, start_date=%s, end_date=%s, mean_min=%s, "
+            "mean_max=%s, ecc_min=%s, ecc_max=%s, format=%s",
+            norad_cat_id, start_date, end_date, mean_motion_min, mean_motion_max,
+            eccentricity_min, eccentricity_max, format_type
+        )
         class_name = 'tle'
-        # Determine which API class to use
+        filter_segments = []
         if norad_cat_id:
-            # Use tle_latest for single satellite
-            filter_segments = [f"NORAD_CAT_ID/{norad_cat_id}"]
-        else:
-            # Use tle for broader queries
-            filter_segments = []
-
-        # Add date filters if provided
-        if start_date and end_date:
-            filter_segments.append(f"EPOCH/{start_date}%2D%2D{end_date}")
-        elif start_date:
-            filter_segments.append(f"EPOCH/%3E{start_date}")
-        elif end_date:
-            filter_segments.append(f"EPOCH/%3C{end_date}")
-        else:
-            filter_segments.append("EPOCH/%3Enow-1")
-        # Add mean motion and eccentricity filters if provided
-        if mean_motion_max and mean_motion_min:
-            filter_segments.append(f"MEAN_MOTION/{mean_motion_min}%2D%2D{mean_motion_max}")
-        elif mean_motion_min:
-            filter_segments.append(f"MEAN_MOTION/%3E{mean_motion_min}")
-        elif mean_motion_max:
-            filter_segments.append(f"MEAN_MOTION/%3C{mean_motion_max}")
-        
-        if eccentricity_max and eccentricity_min:
-            filter_segments.append(f"ECCENTRICITY/{eccentricity_min}%2D%2D{eccentricity_max}")
-        elif eccentricity_min:
-            filter_segments.append(f"ECCENTRICITY/%3E{eccentricity_min}")
-        elif eccentricity_max:
-            filter_segments.append(f"ECCENTRICITY/%3C{eccentricity_max}")
+            filter_segments.append(f"NORAD_CAT_ID/{quote(str(norad_cat_id), safe='')}")
+
+        # (field, min, max, whether to apply the default filter when neither bound is given)
+        range_fields = [
+            ("EPOCH", start_date, end_date, True),
+            ("MEAN_MOTION", mean_motion_min, mean_motion_max, False),
+            ("ECCENTRICITY", eccentricity_min, eccentricity_max, False),
+        ]
+        for name, lo, hi, has_default in range_fields:
+            segment = _range_seg(name, lo, hi, has_default)
+            if segment:
+                filter_segments.append(segment)
 
         # Build the endpoint
         base_endpoint = f"class/{class_name}"
@@ -159,27 +298,62 @@ class SpaceTrackClient:
             full_endpoint = base_endpoint
         if format_type is None:
             format_type = 'json'
+        # Only ship the requested fields
+        if fields:
+            full_endpoint += "/predicates/" + ",".join(fields)
         # Add ordering and format
         full_endpoint += f"/orderby/EPOCH%20DESC/format/{format_type}/LIMIT/{limit}/emptyresult/show"
 
-        print(f"Space-Track API Query Endpoint: {full_endpoint}")  
+        logger.debug("Space-Track API Query Endpoint: %s", full_endpoint)
+
+        # A plain (NORAD ID, EPOCH range) JSON query for all fields can be answered from a broader cached range
+        range_query = (
+            self.cache is not None and format_type == 'json' and norad_cat_id and start_date and end_date
+            and not (mean_motion_min or mean_motion_max or eccentricity_min or eccentricity_max or fields)
+        )
         
         try:
+            if range_query:
+                cached = await self.cache.get_epoch_range(norad_cat_id, start_date, end_date, limit)
+                if cached is not None:
+                    return cached
+
             data = await self.make_request(full_endpoint)
+
+            # Only a result that was not truncated by LIMIT covers the whole range
+            if range_query and isinstance(data, list) and len(data) < limit:
+                await self.cache.put_epoch_range(norad_cat_id, start_date, end_date, data)
             return data
                 
         except Exception as e:
-            print(f"Error in get_tles: {e}")
+            logger.error("Error in get_tles: %s", e)
             if format_type == 'json':
                 return []
             else:
                 return ""
 
+    async def get_tles_bulk(self, norad_cat_ids: List[int], **kwargs) -> List[Union[List[Dict], str]]:
+        """
+        Fetch TLEs for several satellites concurrently.
+        At most MAX_CONCURRENT_REQUESTS queries are in flight at any time.
+        Args:
+            norad_cat_ids (List[int]): NORAD Catalog IDs of the satellites.
+            **kwargs: Additional filters passed to get_tles for every satellite.
+        Returns:
+            List[Union[List[Dict], str]]: The get_tles result for each ID, in the same order.
+        """
+        return await asyncio.gather(
+            *[self.get_tles(norad_cat_id=norad_cat_id, **kwargs) for norad_cat_id in norad_cat_ids]
+        )
+
     async def close(self):
         """
-        Close the aiohttp session if it exists and reset authentication state.
+        Close the shared aiohttp session and the local cache, and reset authentication state.
         """
+        if self.cache is not None:
+            await self.cache.close()
         if self.session:
-            await self.session.close()
+            await close_shared_session()
             self.session = None
-            self._authenticated = False
\ No newline at end of file
+            self._authenticated = False
+            self._auth_expires = 0.0
\ No newline at end of file
@@ -0,0 +1,252 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+from typing import List, Dict, Optional, Union
+
+import aiosqlite
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# Failures that make the cache unusable for one operation; the client then falls back to the network
+CACHE_ERRORS = (sqlite3.Error, OSError, ValueError)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    fetched_at REAL,
+    content_type TEXT,
+    body BLOB
+);
+CREATE TABLE IF NOT EXISTS epoch_ranges (
+    norad_cat_id INTEGER,
+    epoch_start TEXT,
+    epoch_end TEXT,
+    fetched_at REAL,
+    body BLOB,
+    PRIMARY KEY (norad_cat_id, epoch_start, epoch_end)
+);
+"""
+
+
+def _init_db(path: str):
+    """
+    Create the cache database, its directory and its schema if they do not exist.
+    Raises:
+        sqlite3.Error, OSError: If the database cannot be created or opened.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(_SCHEMA)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def default_cache_path() -> str:
+    """
+    Default location of the cache database, under the user's cache directory
+    (MCP hosts often start servers with a read-only working directory).
+    Returns:
+        str: Path of the SQLite database file.
+    """
+    if sys.platform == 'win32':
+        base = os.getenv('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), 'AppData', 'Local')
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Caches')
+    else:
+        base = os.getenv('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'spacetrack-mcp', 'spacetrack_cache.sqlite3')
+
+
+def normalize_epoch(epoch: str) -> str:
+    """
+    Normalize an ISO 8601 epoch string to a naive UTC string that sorts lexicographically.
+    Args:
+        epoch (str): Epoch in ISO 8601 format, with or without timezone (naive means UTC).
+    Returns:
+        str: Epoch formatted as 'YYYY-MM-DDTHH:MM:SS.ffffff'.
+    Raises:
+        ValueError: If the epoch cannot be parsed.
+    """
+    dt = datetime.fromisoformat(epoch.replace('Z', '+00:00'))
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt.isoformat(timespec='microseconds')
+
+
+class TLECache:
+    """
+    Pull-through SQLite cache for Space-Track query responses.
+    Responses are keyed on the query URL and served locally for `ttl` seconds. Complete
+    JSON results of (NORAD ID, EPOCH range) queries are also kept so that narrower
+    ranges for the same satellite can be answered from a slice of a broader one.
+    The cache is best-effort: any database failure is logged and treated as a miss,
+    and a database that cannot be opened disables the cache for the rest of the process.
+    """
+    def __init__(self, path: Optional[str] = None, ttl: float = 300):
+        """
+        Initialize the TLECache.
+        Args:
+            path (Optional[str]): Path of the SQLite database file; defaults to default_cache_path().
+            ttl (float): Number of seconds a cached response stays valid.
+        """
+        self.path = path or default_cache_path()
+        self.ttl = ttl
+        self._db = None
+        self._db_lock = asyncio.Lock()
+        self._disabled = False
+
+    async def _ensure_db(self) -> Optional[aiosqlite.Connection]:
+        """
+        Ensure the SQLite connection is open and the schema exists.
+        Returns:
+            aiosqlite.Connection: The open connection, or None if the cache is disabled.
+        """
+        async with self._db_lock:
+            if self._db is None and not self._disabled:
+                try:
+                    # Validate the database synchronously first: a failed aiosqlite.connect
+                    # leaves its worker thread behind
+                    await asyncio.to_thread(_init_db, self.path)
+                    self._db = await aiosqlite.connect(self.path)
+                except CACHE_ERRORS as e:
+                    logger.warning("Disabling TLE cache, cannot open %s: %s", self.path, e)
+                    self._disabled = True
+                    return None
+        return self._db
+
+    async def get(self, url: str) -> Optional[Union[List[Dict], str]]:
+        """
+        Look up a cached response for a query URL.
+        Args:
+            url (str): The full Space-Track query URL.
+        Returns:
+            Union[List[Dict], str]: The cached payload, or None on a miss, expired entry or cache error.
+        """
+        try:
+            db = await self._ensure_db()
+            if db is None:
+                return None
+            async with db.execute(
+                "SELECT fetched_at, content_type, body FROM responses WHERE url = ?", (url,)
+            ) as cursor:
+                row = await cursor.fetchone()
+            if row is None or time.time() - row[0] > self.ttl:
+                return None
+
+            fetched_at, content_type, body = row
+            if content_type == 'json':
+                return orjson.loads(body)
+            return body.decode('utf-8')
+        except CACHE_ERRORS as e:
+            logger.warning("TLE cache lookup failed: %s", e)
+            return None
+
+    async def put(self, url: str, data: Union[List[Dict], str]):
+        """
+        Store a response for a query URL, replacing any previous entry.
+        Args:
+            url (str): The full Space-Track query URL.
+            data (Union[List[Dict], str]): Parsed JSON data or raw text.
+        """
+        try:
+            if isinstance(data, str):
+                content_type, body = 'text', data.encode('utf-8')
+            else:
+                content_type, body = 'json', orjson.dumps(data)
+
+            db = await self._ensure_db()
+            if db is None:
+                return
+            await db.execute(
+                "INSERT OR REPLACE INTO responses (url, fetched_at, content_type, body) VALUES (?, ?, ?, ?)",
+                (url, time.time(), content_type, body)
+            )
+            await db.commit()
+        except (*CACHE_ERRORS, TypeError) as e:
+            logger.warning("TLE cache store failed: %s", e)
+
+    async def get_epoch_range(self, norad_cat_id: int, start_date: str, end_date: str, limit: int) -> Optional[List[Dict]]:
+        """
+        Answer an EPOCH range query from a cached, complete result covering a broader range.
+        Args:
+            norad_cat_id (int): NORAD Catalog ID of the satellite.
+            start_date (str): Start of the EPOCH range (ISO 8601, inclusive).
+            end_date (str): End of the EPOCH range (ISO 8601, inclusive).
+            limit (int): Maximum number of results to return.
+        Returns:
+            List[Dict]: TLEs within the range, newest first, or None if no cached range covers it.
+        """
+        try:
+            start, end = normalize_epoch(start_date), normalize_epoch(end_date)
+        except ValueError:
+            # Relative ranges such as 'now-7' cannot be compared against cached epochs
+            return None
+
+        try:
+            db = await self._ensure_db()
+            if db is None:
+                return None
+            async with db.execute(
+                "SELECT body FROM epoch_ranges "
+                "WHERE norad_cat_id = ? AND epoch_start <= ? AND epoch_end >= ? AND fetched_at >= ? "
+                "ORDER BY fetched_at DESC LIMIT 1",
+                (norad_cat_id, start, end, time.time() - self.ttl)
+            ) as cursor:
+                row = await cursor.fetchone()
+            if row is None:
+                return None
+
+            rows = [tle for tle in orjson.loads(row[0]) if start <= normalize_epoch(tle['EPOCH']) <= end]
+        except (*CACHE_ERRORS, KeyError) as e:
+            logger.warning("TLE cache range lookup failed: %s", e)
+            return None
+
+        rows.sort(key=lambda tle: normalize_epoch(tle['EPOCH']), reverse=True)
+        return rows[:limit]
+
+    async def put_epoch_range(self, norad_cat_id: int, start_date: str, end_date: str, data: List[Dict]):
+        """
+        Store the complete (untruncated) result of an EPOCH range query.
+        Args:
+            norad_cat_id (int): NORAD Catalog ID of the satellite.
+            start_date (str): Start of the EPOCH range (ISO 8601, inclusive).
+            end_date (str): End of the EPOCH range (ISO 8601, inclusive).
+            data (List[Dict]): Every TLE of the satellite within the range.
+        """
+        try:
+            start, end = normalize_epoch(start_date), normalize_epoch(end_date)
+        except ValueError:
+            return
+
+        try:
+            db = await self._ensure_db()
+            if db is None:
+                return
+            await db.execute(
+                "INSERT OR REPLACE INTO epoch_ranges (norad_cat_id, epoch_start, epoch_end, fetched_at, body) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (norad_cat_id, start, end, time.time(), orjson.dumps(data))
+            )
+            await db.commit()
+        except (*CACHE_ERRORS, TypeError) as e:
+            logger.warning("TLE cache range store failed: %s", e)
+
+    async def close(self):
+        """
+        Close the SQLite connection if it is open.
+        """
+        if self._db is not None:
+            try:
+                await self._db.close()
+            except CACHE_ERRORS as e:
+                logger.warning("Error closing TLE cache: %s", e)
+            self._db = None